@@ -0,0 +1,196 @@
+"""
+Throughput and memory comparison: single uvicorn worker vs preload/fork workers
+Starts each setup in turn, drives /ask with concurrent clients for a fixed duration,
+then prints requests/sec, latency and the shared vs private memory report.
+
+Run from the repo root with the ChromaDB already in place:
+    python -m backend.benchmark_serving --workers 4 --concurrency 16 --duration 30
+
+Each /ask also calls the configured LLM backend. Pass --no-llm to answer those
+calls from an in-process stub instead, so the numbers measure embedding + retrieval.
+"""
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from backend.serve import available_cpus, child_pids, memory_report
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Longer than PreforkServer's own worker shutdown timeout plus an in-flight /ask
+SHUTDOWN_TIMEOUT = 120
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible /chat/completions that answers immediately"""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({"choices": [{"message": {"content": "Stub answer."}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_llm() -> ThreadingHTTPServer:
+    """Serve StubLLMHandler on a free local port from a background thread"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubLLMHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def wait_until_healthy(base_url: str, process: subprocess.Popen, timeout: float) -> bool:
+    """Poll /health until the server answers or the process dies"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            if requests.get(f"{base_url}/health", timeout=2).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(1)
+    return False
+
+
+def run_load(base_url: str, payload: Dict[str, Any], concurrency: int, duration: float) -> Dict[str, Any]:
+    """Hammer /ask from `concurrency` clients and collect throughput/latency"""
+    deadline = time.monotonic() + duration
+
+    def client() -> List[float]:
+        latencies = []
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                response = session.post(f"{base_url}/ask", json=payload, timeout=120)
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            latencies.append((time.perf_counter() - start) if ok else -1.0)
+        return latencies
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: client(), range(concurrency)))
+    elapsed = time.monotonic() - started
+
+    latencies = [lat for client_lats in results for lat in client_lats if lat >= 0]
+    errors = sum(1 for client_lats in results for lat in client_lats if lat < 0)
+    latencies.sort()
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0.0,
+    }
+
+
+def benchmark(name: str, command: List[str], port: int, env: Dict[str, str], args) -> Dict[str, Any]:
+    """Start one server setup, warm it up, load it and collect its memory report"""
+    base_url = f"http://127.0.0.1:{port}"
+    payload = {"question": args.question, "top_k": args.top_k}
+
+    print(f"\n▶️ {name}: {' '.join(command)}")
+    # Own session so the server and any workers it forked can be stopped together
+    process = subprocess.Popen(command, cwd=REPO_ROOT, env=env, start_new_session=True)
+    try:
+        if not wait_until_healthy(base_url, process, args.startup_timeout):
+            raise RuntimeError(f"{name} did not become healthy within {args.startup_timeout}s")
+
+        # Let every worker take a few requests before measuring
+        run_load(base_url, payload, args.concurrency, args.warmup)
+        result = run_load(base_url, payload, args.concurrency, args.duration)
+        result["memory"] = memory_report(process.pid, child_pids(process.pid))
+        return result
+    finally:
+        stop_server(process)
+
+
+def stop_server(process: subprocess.Popen):
+    """SIGTERM the server's process group, SIGKILL whatever is left after the timeout"""
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    try:
+        process.wait(timeout=SHUTDOWN_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        pass
+    # Catches workers orphaned by a parent that exited or had to be killed
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    process.wait()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compare single-worker vs preload/fork serving")
+    parser.add_argument("--workers", type=int, default=available_cpus())
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--question", default="What are passive cooling strategies for hot climates?")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--no-llm", action="store_true",
+                        help="Answer the servers' LLM calls from a local stub")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    if args.no_llm:
+        stub = start_stub_llm()
+        env.update(LLM_API_URL=f"http://127.0.0.1:{stub.server_address[1]}", USE_OLLAMA="false")
+
+    setups = {
+        "single worker": [
+            sys.executable, "-m", "uvicorn", "backend.main:app",
+            "--host", "127.0.0.1", "--port", str(args.port), "--workers", "1",
+        ],
+        f"prefork x{args.workers}": [
+            sys.executable, "-m", "backend.serve",
+            "--host", "127.0.0.1", "--port", str(args.port), "--workers", str(args.workers),
+        ],
+    }
+
+    results = {name: benchmark(name, command, args.port, env, args) for name, command in setups.items()}
+
+    print("\n📊 Results")
+    print(f"{'setup':<16}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'ok':>8}{'errors':>8}")
+    for name, result in results.items():
+        print(f"{name:<16}{result['rps']:>10.2f}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}"
+              f"{result['requests']:>8}{result['errors']:>8}")
+
+    baseline = results["single worker"]["rps"]
+    if baseline:
+        prefork = results[f"prefork x{args.workers}"]["rps"]
+        print(f"Speed-up: {prefork / baseline:.2f}x")
+
+    for name, result in results.items():
+        print(f"\n🧠 Memory - {name}")
+        print(result["memory"])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,324 @@
+"""
+Preload/fork server for the RAG API
+Loads the embedding model and ChromaDB index once in a parent process, then forks
+workers that share those pages copy-on-write instead of each loading their own copy
+(which is what `uvicorn --workers N` does, since it spawns fresh interpreters).
+
+Usage:
+    python -m backend.serve --workers 4 --port 7860
+
+Send SIGUSR1 to the parent process to print a shared vs private memory report.
+"""
+import argparse
+import gc
+import os
+import signal
+import sys
+import time
+import traceback
+from typing import Callable, Dict, List, Optional
+
+import uvicorn
+
+from backend.src.config import config
+
+# A worker that dies sooner than this after being forked counts as a failed start
+MIN_WORKER_UPTIME = 10.0
+MAX_FAILED_STARTS = 5
+MAX_RESPAWN_DELAY = 30.0
+
+MEMORY_FIELDS = ["Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty"]
+
+
+def available_cpus() -> int:
+    """CPUs this process may actually use, honouring affinity and cgroup quotas"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    # os.cpu_count() and affinity both report the host's CPUs inside a
+    # container, so cap by the cgroup CPU quota when one is set
+    quota = None
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max", "r") as f:
+            limit, period = f.read().split()
+        if limit != "max":
+            quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1: quota is -1 when unlimited
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "r") as f:
+                limit = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us", "r") as f:
+                period = int(f.read())
+            if limit > 0 and period > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+
+    if quota is not None:
+        cpus = min(cpus, max(1, int(quota)))
+    return max(1, cpus)
+
+
+def read_memory(pid: int) -> Dict[str, int]:
+    """Read RSS/PSS and shared/private page totals (kB) for a process from /proc"""
+    path = f"/proc/{pid}/smaps_rollup"
+    if not os.path.exists(path):
+        # Older kernels only have the per-mapping file
+        path = f"/proc/{pid}/smaps"
+
+    totals = {field: 0 for field in MEMORY_FIELDS}
+    with open(path, "r") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in totals:
+                totals[key] += int(value.split()[0])
+
+    return {
+        "rss": totals["Rss"],
+        "pss": totals["Pss"],
+        "shared": totals["Shared_Clean"] + totals["Shared_Dirty"],
+        "private": totals["Private_Clean"] + totals["Private_Dirty"],
+    }
+
+
+def child_pids(pid: int) -> List[int]:
+    """Find the direct children of a process by scanning /proc"""
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                # The command name may contain spaces, so split after its closing paren
+                fields = f.read().rsplit(")", 1)[1].split()
+            if int(fields[1]) == pid:
+                children.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return sorted(children)
+
+
+def memory_report(parent_pid: int, worker_pids: List[int]) -> str:
+    """Format shared vs private memory per process, plus the combined footprint"""
+    lines = [f"{'process':<12}{'pid':>8}{'rss MB':>10}{'shared MB':>11}{'private MB':>12}{'pss MB':>10}"]
+    total_rss = 0
+    total_pss = 0
+
+    processes = [("parent", parent_pid)] + [(f"worker {i}", pid) for i, pid in enumerate(worker_pids)]
+    for name, pid in processes:
+        try:
+            mem = read_memory(pid)
+        except OSError:
+            continue
+        total_rss += mem["rss"]
+        total_pss += mem["pss"]
+        lines.append(
+            f"{name:<12}{pid:>8}{mem['rss'] / 1024:>10.1f}{mem['shared'] / 1024:>11.1f}"
+            f"{mem['private'] / 1024:>12.1f}{mem['pss'] / 1024:>10.1f}"
+        )
+
+    lines.append(f"Total PSS (actual footprint): {total_pss / 1024:.1f} MB")
+    lines.append(f"Sum of RSS (if nothing were shared): {total_rss / 1024:.1f} MB")
+    return "\n".join(lines)
+
+
+class PreforkServer:
+    def __init__(self, app, workers: int, host: str, port: int,
+                 torch_threads: int = 0, post_fork: Optional[Callable[[], None]] = None,
+                 memory_report_interval: float = 0):
+        self.app = app
+        self.num_workers = workers
+        self.torch_threads = torch_threads or max(1, available_cpus() // workers)
+        self.post_fork = post_fork
+        self.memory_report_interval = memory_report_interval
+        self.uv_config = uvicorn.Config(app, host=host, port=port)
+        self.sock = None
+        self.workers: Dict[int, int] = {}
+        self.started_at: Dict[int, float] = {}
+        self.failed_starts: Dict[int, int] = {}
+        self.pending_respawns: Dict[int, float] = {}
+        self.should_exit = False
+        self.exit_code = 0
+        self.report_requested = False
+
+    def run(self) -> int:
+        """Bind once, fork the workers and supervise them until told to stop"""
+        self.sock = self.uv_config.bind_socket()
+
+        # Move everything loaded so far out of the GC's reach so collections
+        # in the workers don't write to (and un-share) the parent's pages
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGINT, self._handle_exit)
+        signal.signal(signal.SIGTERM, self._handle_exit)
+        signal.signal(signal.SIGUSR1, self._handle_report)
+
+        print(f"🚀 Forking {self.num_workers} workers ({self.torch_threads} torch threads each)")
+        for index in range(self.num_workers):
+            self._spawn(index)
+
+        last_report = time.monotonic()
+        while not self.should_exit:
+            self._reap_and_respawn()
+            self._respawn_due()
+
+            interval_due = (self.memory_report_interval
+                            and time.monotonic() - last_report >= self.memory_report_interval)
+            if self.report_requested or interval_due:
+                print(memory_report(os.getpid(), list(self.workers)), flush=True)
+                self.report_requested = False
+                last_report = time.monotonic()
+
+            time.sleep(0.5)
+
+        self._shutdown()
+        return self.exit_code
+
+    def _spawn(self, index: int):
+        # Otherwise each child inherits (and re-prints) the parent's buffered output
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                self._run_worker()
+            except BaseException:
+                traceback.print_exc()
+                exit_code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(exit_code)
+        self.workers[pid] = index
+        self.started_at[index] = time.monotonic()
+
+    def _run_worker(self):
+        # uvicorn installs its own SIGINT/SIGTERM handlers; SIGUSR1 is meant for the
+        # parent, and its default action would kill a worker caught by `pkill -USR1`
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+
+        # Each worker gets its own slice of the cores instead of every
+        # worker's intra-op pool fighting over all of them
+        import torch
+        torch.set_num_threads(self.torch_threads)
+
+        if self.post_fork:
+            self.post_fork()
+
+        uvicorn.Server(self.uv_config).run(sockets=[self.sock])
+
+    def _reap_and_respawn(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+
+            index = self.workers.pop(pid, None)
+            if index is None or self.should_exit:
+                continue
+
+            if time.monotonic() - self.started_at[index] < MIN_WORKER_UPTIME:
+                self.failed_starts[index] = self.failed_starts.get(index, 0) + 1
+            else:
+                self.failed_starts[index] = 0
+
+            failures = self.failed_starts[index]
+            if failures >= MAX_FAILED_STARTS:
+                print(f"❌ Worker {index} failed to start {failures} times in a row, shutting down")
+                self.should_exit = True
+                self.exit_code = 1
+                return
+
+            delay = min(2 ** failures - 1, MAX_RESPAWN_DELAY)
+            print(f"⚠️ Worker {index} (pid {pid}) exited with code {os.waitstatus_to_exitcode(status)}, "
+                  f"restarting in {delay:.0f}s")
+            self.pending_respawns[index] = time.monotonic() + delay
+
+    def _respawn_due(self):
+        now = time.monotonic()
+        for index, due in list(self.pending_respawns.items()):
+            if due <= now:
+                del self.pending_respawns[index]
+                self._spawn(index)
+
+    def _shutdown(self, timeout: float = 30):
+        print("🛑 Stopping workers...")
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        deadline = time.monotonic() + timeout
+        while self.workers and time.monotonic() < deadline:
+            self._reap_and_respawn()
+            time.sleep(0.1)
+
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+
+        self.sock.close()
+
+    def _handle_exit(self, signum, frame):
+        self.should_exit = True
+
+    def _handle_report(self, signum, frame):
+        self.report_requested = True
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Serve the RAG API from preloaded, forked workers")
+    parser.add_argument("--host", default=config.SERVE_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVE_PORT)
+    parser.add_argument("--workers", type=int, default=config.SERVE_WORKERS,
+                        help="Number of workers (0 = one per CPU)")
+    parser.add_argument("--torch-threads", type=int, default=config.TORCH_THREADS_PER_WORKER,
+                        help="Torch threads per worker (0 = CPUs / workers)")
+    parser.add_argument("--memory-report-interval", type=float, default=0,
+                        help="Print a memory report every N seconds (0 = only on SIGUSR1)")
+    args = parser.parse_args(argv)
+
+    if args.workers < 0:
+        parser.error("--workers must be 0 or greater")
+    if args.torch_threads < 0:
+        parser.error("--torch-threads must be 0 or greater")
+
+    # Keep the parent single-threaded: loading the weights runs parallel copies,
+    # and an OpenMP pool started before fork() can hang the workers that use it.
+    # Workers set their own thread count after forking
+    import torch
+    torch.set_num_threads(1)
+
+    # Importing the app loads the embedding model and opens the collection, once, here
+    from backend import main as api
+    api.rag_pipeline.db.warm_index()
+
+    server = PreforkServer(
+        api.app,
+        workers=args.workers or available_cpus(),
+        host=args.host,
+        port=args.port,
+        torch_threads=args.torch_threads,
+        post_fork=api.rag_pipeline.db.reset_connections,
+        memory_report_interval=args.memory_report_interval,
+    )
+    return server.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -35,6 +35,12 @@ class Config:
     CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "512"))
     CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "50"))
     
+    # Serving settings - preload/fork mode (python -m backend.serve)
+    SERVE_HOST = os.getenv("SERVE_HOST", "0.0.0.0")
+    SERVE_PORT = int(os.getenv("SERVE_PORT", "7860"))
+    SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", "2"))  # 0 = one worker per available CPU
+    TORCH_THREADS_PER_WORKER = int(os.getenv("TORCH_THREADS_PER_WORKER", "0"))  # 0 = CPUs / workers
+    
     # Environment detection
     IS_HF_SPACES = os.getenv("SPACE_ID") is not None
     USE_OLLAMA = os.getenv("USE_OLLAMA", "false").lower() == "true"
@@ -103,6 +103,25 @@ class ResearchPaperDatabase:
         
         return SentenceTransformerEmbeddingFunction(self.embedding_model)
     
+    def warm_index(self):
+        """Load the HNSW index into memory so forked workers share its pages"""
+        try:
+            dimension = self.embedding_model.get_sentence_embedding_dimension()
+            probe = [1.0] + [0.0] * (dimension - 1)
+            # Query by embedding so the model's forward pass (and its thread pool) stays untouched
+            self.collection.query(query_embeddings=[probe], n_results=1)
+            print(f"✅ Warmed index for collection: {config.COLLECTION_NAME}")
+        except Exception as e:
+            print(f"⚠️ Index warm-up failed (workers will load it lazily): {e}")
+    
+    def reset_connections(self):
+        """Drop SQLite connections inherited across fork; each worker reopens its own"""
+        # Relies on chromadb==0.4.22 internals: the client's System holds a single
+        # SqliteDB whose PerThreadPool reconnects lazily after close(). No fallback on
+        # failure - a worker must never keep using a connection from before fork()
+        from chromadb.db.impl.sqlite import SqliteDB
+        self.client._system.instance(SqliteDB)._conn_pool.close()
+    
     def query_documents(self, query: str, n_results: int = 5) -> Dict[str, Any]:
         """Query documents using semantic search"""
         try: